@@ -15,9 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk
-
-import time
+from gi.repository import Gtk, GLib
 
 @Gtk.Template(resource_path='/com/usebottles/bottles/download-entry.ui')
 class BottlesDownloadEntry(Gtk.Box):
@@ -46,10 +44,20 @@ class BottlesDownloadEntry(Gtk.Box):
 
         if not stoppable: self.btn_cancel.hide()
 
+        self.pulsing = False
+        self.connect("destroy", self.stop_pulse)
+
     '''
-    Make the progressbar pulse every 1 second
+    Make the progressbar pulse every 1 second until the entry
+    is destroyed, this is safe to call from any thread
     '''
     def pulse(self):
-        while True:
-            time.sleep(1)
-            self.progressbar_download.pulse()
+        self.pulsing = True
+        GLib.timeout_add_seconds(1, self.update_pulse)
+
+    def update_pulse(self):
+        if self.pulsing: self.progressbar_download.pulse()
+        return self.pulsing
+
+    def stop_pulse(self, widget):
+        self.pulsing = False
@@ -15,9 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk
-
-import time
+from gi.repository import Gtk, GLib
 
 @Gtk.Template(resource_path='/com/usebottles/bottles/create.ui')
 class BottlesCreate(Gtk.Box):
@@ -46,6 +44,14 @@ class BottlesCreate(Gtk.Box):
         Common variables
         '''
         self.window = window
+        self.pulsing = False
+
+        '''
+        Mark kept at the end of the output, with right gravity it
+        moves forward with the text inserted at it
+        '''
+        self.end_mark = self.buffer_output.create_mark(
+            None, self.buffer_output.get_end_iter(), False)
 
         '''
         Connect signals to widgets
@@ -62,10 +68,26 @@ class BottlesCreate(Gtk.Box):
             self.label_creating.set_visible(True)
             self.buffer_output.set_text("")
         elif status == "created":
+            self.pulsing = False
             self.btn_list.set_visible(True)
             self.box_created.set_visible(True)
             self.label_creating.set_visible(False)
 
+    '''
+    Append text to the output, the text is inserted from the main
+    loop so this is safe to call from any thread
+    '''
+    def append_output(self, text, markup=False):
+        GLib.idle_add(self.insert_output, text, markup)
+
+    def insert_output(self, text, markup=False):
+        iter = self.buffer_output.get_iter_at_mark(self.end_mark)
+
+        if markup:
+            self.buffer_output.insert_markup(iter, text, -1)
+        else:
+            self.buffer_output.insert(iter, text)
+
     def show_details(self, widget):
         self.window.stack_main.set_visible_child_name("page_list")
         self.set_status("initial")
@@ -76,10 +98,15 @@ class BottlesCreate(Gtk.Box):
         self.window.page_list.update_bottles()
 
     '''
-    Make the progressbar pulse every 1 second
+    Make the progressbar pulse every 1 second until the bottle
+    is created, this is safe to call from any thread
     '''
     def pulse(self):
-        while True:
-            time.sleep(1)
-            self.progressbar_create.pulse()
+        if self.pulsing: return
+        self.pulsing = True
+        GLib.timeout_add_seconds(1, self.update_pulse)
+
+    def update_pulse(self):
+        if self.pulsing: self.progressbar_create.pulse()
+        return self.pulsing
 
@@ -92,7 +92,8 @@ class BottlesListEntry(Gtk.Box):
         self.label_environment_context.add_class(
             "tag-%s" % self.configuration.get("Environment").lower())
 
-        if self.configuration.get("Runner") != self.runner.get_latest_runner(self.runner_type):
+        latest_runner = self.runner.get_latest_runner(self.runner_type)
+        if latest_runner is not None and self.configuration.get("Runner") != latest_runner:
             self.btn_upgrade.set_visible(True)
 
         if self.configuration.get("Broken"):
@@ -178,18 +179,28 @@ class BottlesListEntry(Gtk.Box):
     Show a confirm dialog to update bottle runner with the latest
     '''
     def upgrade_runner(self, widget):
+        latest_runner = self.runner.get_latest_runner(self.runner_type)
+
+        '''
+        Skip the upgrade if no runner of this type is installed
+        '''
+        if latest_runner is None:
+            logging.warning("No `%s` runner available for the upgrade." % self.runner_type)
+            self.btn_upgrade.set_visible(False)
+            return
+
         dialog_upgrade = BottlesMessageDialog(parent=self.window,
                                       title="Confirm upgrade",
                                       message="This will change the runner from `%s` to `%s`." % (
                                           self.configuration.get("Runner"),
-                                          self.runner.get_latest_runner()))
+                                          latest_runner))
         response = dialog_upgrade.run()
 
         if response == Gtk.ResponseType.OK:
             logging.info("OK status received")
             self.runner.update_configuration(self.configuration,
                                              "Runner",
-                                             self.runner.get_latest_runner())
+                                             latest_runner)
             self.btn_upgrade.set_visible(False)
         else:
             logging.info("Cancel status received")
@@ -15,12 +15,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import os, subprocess, urllib.request, json, tarfile, time, shutil, re, hashlib
+import os, io, math, mmap, shlex, tempfile, subprocess, urllib.request, urllib.error, http.client, json, tarfile, time, shutil, re, hashlib
 
 from glob import glob
-from threading import Thread
+from collections import deque
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import date
+from datetime import date, datetime
 
 from .download import BottlesDownloadEntry
 from .pages.list import BottlesListEntry
@@ -28,22 +30,47 @@ from .utils import UtilsTerminal, UtilsLogger
 
 logging = UtilsLogger()
 
-class RunAsync(Thread):
+'''
+Use orjson to parse and serialize json if available, it is faster
+and works with bytes directly
+'''
+try:
+    import orjson
+    json_loads = orjson.loads
 
-    def __init__(self, task_name, task_func, task_args=False):
-        Thread.__init__(self)
+    def json_dumps(data):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+except ImportError:
+    json_loads = json.loads
 
-        self.task_name = task_name
-        self.task_func = task_func
-        self.task_args = task_args
+    def json_dumps(data):
+        return json.dumps(data, indent=4).encode("utf-8")
 
-    def run(self):
-        logging.debug('Running async job `%s`.' % self.task_name)
+'''
+Shared pool for async jobs, threads are reused between jobs and
+the number of concurrent jobs is bounded
+'''
+async_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bottles")
 
-        if not self.task_args:
-            self.task_func()
-        else:
-            self.task_func(self.task_args)
+def run_async(task_name, task_func, task_args=False):
+    logging.debug('Running async job `%s`.' % task_name)
+
+    if not task_args:
+        future = async_executor.submit(task_func)
+    else:
+        future = async_executor.submit(task_func, task_args)
+
+    '''
+    Exceptions are stored in the future, log them instead of
+    losing them silently
+    '''
+    def log_exception(future):
+        if future.exception():
+            logging.error("Async job `%s` failed: %s" % (
+                task_name, future.exception()))
+
+    future.add_done_callback(log_exception)
+    return future
 
 class BottlesRunner:
 
@@ -67,6 +94,7 @@ class BottlesRunner:
     runners_path = "%s/.local/share/bottles/runners" % Path.home()
     bottles_path = "%s/.local/share/bottles/bottles" % Path.home()
     dxvk_path = "%s/.local/share/bottles/dxvk" % Path.home()
+    github_cache_path = "%s/.cache/bottles/gh" % Path.home()
 
     '''
     Do not implement dxgi.dll <https://github.com/doitsujin/dxvk/wiki/DXGI>
@@ -77,9 +105,65 @@ class BottlesRunner:
         "d3d9.dll",
     ]
 
-    runners_available = []
-    dxvk_available = []
-    local_bottles = {}
+    '''
+    Read buffer used by tarfile when extracting archives from a stream
+    '''
+    tar_stream_bufsize = 2*1024*1024
+
+    '''
+    Flags needed by tar to decompress an archive read from a pipe,
+    where it cannot detect the compression by itself
+    '''
+    tar_compression_flags = {
+        ".tar.gz": "-z",
+        ".tgz": "-z",
+        ".tar.xz": "-J",
+        ".tar.bz2": "-j",
+        ".tar.zst": "--zstd",
+    }
+
+    '''
+    Checksums supported in dependency manifests as `file_<algo>`,
+    in order of preference
+    '''
+    checksum_algos = ["sha256", "blake2b"]
+
+    '''
+    Pattern of the executable path stored in .lnk files
+    '''
+    lnk_executable_pattern = re.compile(rb'C:[^\x00]*?\.exe', re.IGNORECASE)
+
+    '''
+    Environment variables set for each enabled bottle parameter,
+    `{path}` is replaced with the bottle path
+    '''
+    parameters_environment = [
+        ("dxvk", [
+            "DXVK_STATE_CACHE_PATH='{path}'",
+            "STAGING_SHARED_MEMORY=1",
+            "__GL_DXVK_OPTIMIZATIONS=1",
+            "__GL_SHADER_DISK_CACHE=1",
+            "__GL_SHADER_DISK_CACHE_PATH='{path}'",
+        ]),
+        ("esync", ["WINEESYNC=1", "WINEDEBUG=+esync"]),
+        ("fsync", ["WINEFSYNC=1"]),
+        ("aco_compiler", ["RADV_PERFTEST=aco"]),
+        ("pulseaudio_latency", ["PULSE_LATENCY_MSEC=60"]),
+    ]
+
+    nvidia_prime_environment = [
+        "__NV_PRIME_RENDER_OFFLOAD=1",
+        "__GLX_VENDOR_LIBRARY_NAME='nvidia'",
+        "__VK_LAYER_NV_optimus='NVIDIA_only'",
+    ]
+
+    '''
+    Shell command line of a wine command, used when the command runs
+    in a terminal. Stored as the bound `format` of the template
+    '''
+    wine_command_line = "WINEPREFIX={path} WINEARCH=win64 {env} {runner} {command}".format
+
+    size_units = ['', 'Ki', 'Mi', 'Gi', 'Ti', 'Pi', 'Ei', 'Zi', 'Yi']
 
     '''
     Structure of bottle configuration file
@@ -127,7 +211,32 @@ class BottlesRunner:
         }
     }
 
-    supported_dependencies = {}
+    '''
+    Parameters of each environment, by lowercase environment name
+    '''
+    environments_parameters = {name.lower(): environment["Parameters"]
+                               for name, environment in environments.items()}
+
+    '''
+    Check for an NVIDIA display controller in sysfs, the result is
+    computed once since the hardware can't change while running
+    '''
+    def has_nvidia_gpu(self):
+        if self.nvidia_gpu is None:
+            self.nvidia_gpu = False
+
+            for device in glob("/sys/bus/pci/devices/*"):
+                try:
+                    with open("%s/class" % device) as device_class, \
+                         open("%s/vendor" % device) as device_vendor:
+                        if device_class.read().startswith("0x03") and \
+                           device_vendor.read().strip() == "0x10de":
+                            self.nvidia_gpu = True
+                            break
+                except OSError:
+                    pass
+
+        return self.nvidia_gpu
 
     def __init__(self, window, **kwargs):
         super().__init__(**kwargs)
@@ -139,24 +248,79 @@ class BottlesRunner:
         self.settings = window.settings
         self.utils_conn = window.utils_conn
 
-        self.check_runners(install_latest=False)
-        self.check_dxvk(install_latest=False)
-        self.fetch_dependencies()
-        self.check_bottles()
+        '''
+        Locally available components and bottles, and the dependencies
+        supported by the repository
+        '''
+        self.runners_available = []
+        self.latest_runners = {"wine": None, "proton": None}
+        self.dxvk_available = []
+        self.local_bottles = {}
+        self.supported_dependencies = {}
+
+        '''
+        Parsed bottle configurations by bottle path, with the
+        mtime of their bottle.json
+        '''
+        self.bottles_cache = {}
+
+        '''
+        ETag of the last fetched dependencies index
+        '''
+        self.dependencies_etag = None
+
+        '''
+        Last connection check as (time, status)
+        '''
+        self.connection_status = None
+        self.connection_lock = Lock()
+
+        '''
+        Whether an NVIDIA gpu is present, checked on first use
+        '''
+        self.nvidia_gpu = None
+
+        self.run_checks(install_latest=False)
         self.clear_temp()
 
+    '''
+    Check the connection, reusing the result for `ttl` seconds so
+    the checks made in a burst (e.g. at startup) probe only once
+    '''
+    def cached_check_connection(self, ttl=2.0):
+        with self.connection_lock:
+            now = time.monotonic()
+
+            if self.connection_status is None or now - self.connection_status[0] > ttl:
+                self.connection_status = (now, self.utils_conn.check_connection())
+
+            return self.connection_status[1]
+
+    '''
+    Run the runners, dxvk, bottles and dependencies checks concurrently,
+    each check writes only its own attribute so they can't race
+    '''
+    def run_checks(self, install_latest=True):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            checks = [
+                executor.submit(self.check_runners, install_latest),
+                executor.submit(self.check_dxvk, install_latest),
+                executor.submit(self.check_bottles),
+                executor.submit(self.fetch_dependencies),
+            ]
+
+        for check in checks:
+            check.result()
+
     '''
     Performs all checks in one async shot
     '''
     def async_checks(self):
         self.check_runners_dir()
-        self.check_runners()
-        self.check_dxvk()
-        self.check_bottles()
-        self.fetch_dependencies()
+        self.run_checks()
 
     def checks(self):
-        a = RunAsync('checks', self.async_checks);a.start()
+        run_async('checks', self.async_checks)
 
     '''
     Clear temp path
@@ -165,8 +329,8 @@ class BottlesRunner:
         logging.info("Cleaning the temp path.")
 
         if self.settings.get_boolean("temp") or force:
-            for f in os.listdir(self.temp_path):
-                os.remove(os.path.join(self.temp_path, f))
+            shutil.rmtree(self.temp_path, ignore_errors=True)
+            os.makedirs(self.temp_path, exist_ok=True)
 
 
     '''
@@ -195,38 +359,84 @@ class BottlesRunner:
 
         return True
 
+    '''
+    Request a GitHub API resource, the response is cached on disk with
+    its ETag so unchanged resources are answered with an empty 304,
+    which does not count against the rate limit
+    '''
+    def get_github_api(self, url):
+        cache_file = "%s/%s.json" % (self.github_cache_path,
+                                     hashlib.sha1(url.encode()).hexdigest())
+        cache = {}
+
+        if os.path.isfile(cache_file):
+            try:
+                with open(cache_file) as f:
+                    cache = json.load(f)
+            except ValueError:
+                logging.warning("Broken cache for `%s`, ignoring." % url)
+
+        request = urllib.request.Request(url)
+        if cache.get("etag"):
+            request.add_header("If-None-Match", cache["etag"])
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+                etag = response.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return json_loads(cache["body"])
+            raise
+
+        if etag:
+            os.makedirs(self.github_cache_path, exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump({"etag": etag, "body": body.decode("utf-8")}, f)
+
+        return json_loads(body)
+
     '''
     Get latest runner updates
     '''
     def get_runner_updates(self):
         updates = {}
 
-        if self.utils_conn.check_connection():
+        if self.cached_check_connection():
+            '''
+            Fetch wine and proton releases at the same time
+            '''
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                wine_releases = executor.submit(self.get_github_api,
+                                                self.repository_api)
+                proton_releases = executor.submit(self.get_github_api,
+                                                  self.proton_repository_api)
+
+            runners_available = set(self.runners_available)
+
             '''
             wine
             '''
-            with urllib.request.urlopen(self.repository_api) as url:
-                releases = json.loads(url.read().decode())
-                for release in [releases[0], releases[1], releases[2]]:
-                    tag = release["tag_name"]
-                    file = release["assets"][0]["name"]
-                    if "%s-x86_64" % tag not in self.runners_available:
-                        updates[tag] = file
-                    else:
-                        logging.warning("Latest wine runner is `%s` and is already installed." % tag)
+            releases = wine_releases.result()
+            for release in releases[:3]:
+                tag = release["tag_name"]
+                file = release["assets"][0]["name"]
+                if "%s-x86_64" % tag not in runners_available:
+                    updates[tag] = file
+                else:
+                    logging.warning("Latest wine runner is `%s` and is already installed." % tag)
 
             '''
             proton
             '''
-            with urllib.request.urlopen(self.proton_repository_api) as url:
-                releases = json.loads(url.read().decode())
-                for release in [releases[0], releases[1], releases[2]]:
-                    tag = release["tag_name"]
-                    file = release["assets"][0]["name"]
-                    if "Proton-%s" % tag not in self.runners_available:
-                        updates[tag] = file
-                    else:
-                        logging.warning("Latest proton runner is `%s` and is already installed." % tag)
+            releases = proton_releases.result()
+            for release in releases[:3]:
+                tag = release["tag_name"]
+                file = release["assets"][0]["name"]
+                if "Proton-%s" % tag not in runners_available:
+                    updates[tag] = file
+                else:
+                    logging.warning("Latest proton runner is `%s` and is already installed." % tag)
 
         '''
         Send a notificationif the user settings allow it
@@ -245,16 +455,17 @@ class BottlesRunner:
     def get_dxvk_updates(self):
         updates = {}
 
-        if self.utils_conn.check_connection():
-            with urllib.request.urlopen(self.dxvk_repository_api) as url:
-                releases = json.loads(url.read().decode())
-                for release in [releases[0], releases[1], releases[2]]:
-                    tag = release["tag_name"]
-                    file = release["assets"][0]["name"]
-                    if "dxvk-%s" % tag[1:] not in self.dxvk_available:
-                        updates[tag] = file
-                    else:
-                        logging.warning("Latest dxvk is `%s` and is already installed." % tag)
+        if self.cached_check_connection():
+            dxvk_available = set(self.dxvk_available)
+
+            releases = self.get_github_api(self.dxvk_repository_api)
+            for release in releases[:3]:
+                tag = release["tag_name"]
+                file = release["assets"][0]["name"]
+                if "dxvk-%s" % tag[1:] not in dxvk_available:
+                    updates[tag] = file
+                else:
+                    logging.warning("Latest dxvk is `%s` and is already installed." % tag)
 
         '''
         Send a notificationif the user settings allow it
@@ -268,48 +479,150 @@ class BottlesRunner:
         return updates
 
     '''
-    Extract a component archive
+    Get the local path where a component should be extracted
     '''
-    def extract_component(self, component, archive):
-        if component in ["runner", "runner:proton"]: path = self.runners_path
-        if component == "dxvk": path = self.dxvk_path
-
-        archive = tarfile.open("%s/%s" % (self.temp_path, archive))
-        archive.extractall(path)
+    def get_component_path(self, component):
+        if component in ["runner", "runner:proton"]: return self.runners_path
+        if component == "dxvk": return self.dxvk_path
 
     '''
-    Download a specific component release
+    Get the download url of a component release
     '''
-    def download_component(self, component, tag, file, rename=False, checksum=False):
+    def get_component_url(self, component, tag, file):
+        if component == "dependency": return tag
         if component == "runner": repository = self.repository
         if component == "runner:proton": repository = self.proton_repository
         if component == "dxvk": repository = self.dxvk_repository
-        if component == "dependency":
-            repository = self.dependencies_repository
-            download_url = tag
-        else:
-            download_url = "%s/download/%s/%s" % (repository, tag, file)
+
+        return "%s/download/%s/%s" % (repository, tag, file)
+
+    '''
+    Extract a component archive from a non-seekable stream (e.g. an
+    http response), read sequentially with a 2 MiB buffer instead of
+    the default 10 KiB tarfile record size
+    '''
+    def extract_component(self, archive, file, path):
+        try:
+            with tarfile.open(fileobj=archive,
+                              mode="r|*",
+                              bufsize=self.tar_stream_bufsize) as archive:
+                archive.extractall(path)
+        except (tarfile.TarError, EOFError, OSError, http.client.HTTPException) as e:
+            logging.error("Failed to extract `%s`: %s" % (file, e))
+            return False
+
+        return True
+
+    '''
+    Extract a component archive stream using the system tar, which
+    decompresses in C and in its own process while the stream is
+    still being read
+    '''
+    def extract_component_native(self, archive, file, path):
+        compression = [flag for extension, flag in self.tar_compression_flags.items()
+                       if file.endswith(extension)]
+        command = ["tar", "-x"] + compression[:1] + ["-f", "-", "-C", path]
+
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        try:
+            shutil.copyfileobj(archive, process.stdin, length=1024*1024)
+        except BrokenPipeError:
+            pass
+        except (OSError, http.client.HTTPException) as e:
+            '''
+            The download was interrupted, stop tar instead of letting
+            it extract the truncated archive
+            '''
+            logging.error("Failed to download `%s`: %s" % (file, e))
+            process.kill()
+            process.wait()
+            return False
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        if process.wait() != 0:
+            logging.error("Failed to extract `%s`, tar exited with status %s." % (
+                file, process.returncode))
+            return False
+
+        return True
+
+    '''
+    Download and extract a component archive in one pass, the
+    response is decompressed while it is downloaded and no copy
+    is staged in the temp path. The archive is extracted in a
+    staging directory whose entries are moved in place only on
+    success, so a failed or running install is never listed as
+    an installed component. Return False if the install fails
+    '''
+    def stream_download_and_extract(self, component, url):
+        file = url.split("/")[-1]
+        path = self.get_component_path(component)
+        os.makedirs(path, exist_ok=True)
+        staging_path = tempfile.mkdtemp(prefix=".bottles-", dir=path)
+
+        try:
+            with urllib.request.urlopen(url) as response:
+                stream = io.BufferedReader(response, buffer_size=128*1024)
+
+                '''
+                Fallback to tarfile if tar is not available or the archive
+                compression is not known
+                '''
+                if shutil.which("tar") and file.endswith(tuple(self.tar_compression_flags)):
+                    extracted = self.extract_component_native(stream, file, staging_path)
+                else:
+                    extracted = self.extract_component(stream, file, staging_path)
+
+            if extracted:
+                for entry in os.listdir(staging_path):
+                    entry_path = "%s/%s" % (path, entry)
+                    if os.path.lexists(entry_path):
+                        logging.info("Replacing the existing `%s`." % entry_path)
+                        if os.path.isdir(entry_path):
+                            self.remove_tree(entry_path)
+                        else:
+                            os.remove(entry_path)
+                    os.rename("%s/%s" % (staging_path, entry), entry_path)
+        except Exception as e:
+            logging.error("Failed to install `%s`: %s" % (file, e))
+            extracted = False
+        finally:
+            self.remove_tree(staging_path)
+
+        return extracted
+
+    '''
+    Download a specific component release
+    '''
+    def download_component(self, component, tag, file, rename=False, checksum=False, checksum_algo="md5"):
+        download_url = self.get_component_url(component, tag, file)
 
         '''
-        Check if file already exists in temp path then do not
-        download it again
+        The `rename` parameter mean that downloaded file should be
+        saved with another name
         '''
         file = rename if rename else file
-        if os.path.isfile("%s/%s" % (self.temp_path, file)):
-            logging.warning("File `%s` already exists in temp, skipping." % file)
-        else:
-            urllib.request.urlretrieve(download_url, "%s/%s" % (self.temp_path, file))
+        file_path = "%s/%s" % (self.temp_path, file)
 
         '''
-        The `rename` parameter mean that downloaded file should be
-        renamed to another name
+        Check if file already exists in temp path then do not
+        download it again
         '''
-        if rename:
-            logging.info("Renaming `%s` to `%s`." % (file, rename))
-            file_path = "%s/%s" % (self.temp_path, rename)
-            os.rename("%s/%s" % (self.temp_path, file), file_path)
+        if os.path.isfile(file_path):
+            logging.warning("File `%s` already exists in temp, skipping." % file)
         else:
-            file_path = "%s/%s" % (self.temp_path, file)
+            '''
+            Write the response straight to the temp path in 1 MiB
+            chunks, under a partial name until it is complete
+            '''
+            with urllib.request.urlopen(download_url) as response, \
+                 open("%s.part" % file_path, "wb") as f:
+                shutil.copyfileobj(response, f, length=1024*1024)
+            os.replace("%s.part" % file_path, file_path)
 
         '''
         Compare checksums to check file corruption
@@ -317,11 +630,13 @@ class BottlesRunner:
         if checksum:
             checksum = checksum.lower()
 
-            local_checksum = hashlib.md5()
-
             with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    local_checksum.update(chunk)
+                if hasattr(hashlib, "file_digest"):
+                    local_checksum = hashlib.file_digest(f, checksum_algo)
+                else:
+                    local_checksum = hashlib.new(checksum_algo)
+                    for chunk in iter(lambda: f.read(1024*1024), b""):
+                        local_checksum.update(chunk)
 
             local_checksum = local_checksum.hexdigest().lower()
 
@@ -367,15 +682,30 @@ class BottlesRunner:
         logging.info("Installing the `%s` component." % tag)
 
         '''
-        Run the progressbar update async
+        Start the progressbar pulse
         '''
-        a = RunAsync('pulse', download_entry.pulse);a.start()
+        download_entry.pulse()
 
         '''
         Download and extract the component archive
         '''
-        self.download_component(component, tag, file)
-        self.extract_component(component, file)
+        extracted = self.stream_download_and_extract(component,
+                                                     self.get_component_url(component,
+                                                                            tag,
+                                                                            file))
+
+        '''
+        Stop here if the extraction failed, the partially
+        extracted files are already removed
+        '''
+        if not extracted:
+            logging.error("Installation of the `%s` component failed." % tag)
+            if self.settings.get_boolean("notifications"):
+                self.window.send_notification("Download manager",
+                                              "Installation of `%s` component failed!" % tag,
+                                              "dialog-error-symbolic")
+            download_entry.destroy()
+            return False
 
         '''
         Clear available component list and do the check again
@@ -411,10 +741,9 @@ class BottlesRunner:
 
     def install_component(self, component,  tag, file):
         if self.utils_conn.check_connection(True):
-            a = RunAsync('install', self.async_install_component, [component,
-                                                                   tag,
-                                                                   file])
-            a.start()
+            run_async('install', self.async_install_component, [component,
+                                                                tag,
+                                                                file])
 
     '''
     Method for deoendency installations
@@ -450,9 +779,9 @@ class BottlesRunner:
         ))
 
         '''
-        Run the progressbar update async
+        Start the progressbar pulse
         '''
-        a = RunAsync('pulse', download_entry.pulse);a.start()
+        download_entry.pulse()
 
         '''
         Get dependency manifest from repository
@@ -468,26 +797,42 @@ class BottlesRunner:
             Step type: delete_sys32_dlls
             '''
             if step["action"] == "delete_sys32_dlls":
+                bottle_name = configuration.get("Name")
+                system32_path = f"{self.bottles_path}/{bottle_name}/drive_c/windows/system32"
+
                 for dll in step["dlls"]:
                     try:
                         logging.info("Removing `%s` dll from system32 for `%s` bottle" % (
-                            dll, configuration.get("Name")
+                            dll, bottle_name
                         ))
-                        os.remove("%s/%s/drive_c/windows/system32/%s" % (
-                            self.bottles_path, configuration.get("Name"), dll))
+                        os.remove(f"{system32_path}/{dll}")
                     except:
                         logging.error("`%s` dll not found for `%s` bottle, failed to remove from system32."% (
-                            dll, configuration.get("Name")
+                            dll, bottle_name
                         ))
             '''
             Step type: install_exe, install_msi
             '''
             if step["action"] in ["install_exe", "install_msi"]:
+                '''
+                Prefer the faster sha256 (hardware accelerated on most
+                CPUs) and blake2b checksums when the manifest provides
+                them, `file_checksum` is a md5
+                '''
+                checksum_algo = "md5"
+                checksum = step.get("file_checksum")
+                for algo in self.checksum_algos:
+                    if step.get("file_%s" % algo):
+                        checksum_algo = algo
+                        checksum = step.get("file_%s" % algo)
+                        break
+
                 download = self.download_component("dependency",
                                         step.get("url"),
                                         step.get("file_name"),
                                         step.get("rename"),
-                                        checksum=step.get("file_checksum"))
+                                        checksum=checksum,
+                                        checksum_algo=checksum_algo)
                 if download:
                     if step.get("rename"):
                         file = step.get("rename")
@@ -528,11 +873,10 @@ class BottlesRunner:
 
     def install_dependency(self, configuration, dependency, widget):
         if self.utils_conn.check_connection(True):
-            a = RunAsync('install_dependency',
-                         self.async_install_dependency, [configuration,
-                                                         dependency,
-                                                         widget])
-            a.start()
+            run_async('install_dependency',
+                      self.async_install_dependency, [configuration,
+                                                      dependency,
+                                                      widget])
 
     def remove_dependency(self, configuration, dependency, widget):
         logging.info("Removing `%s` dependency from `%s` bottle configuration." % (
@@ -557,15 +901,23 @@ class BottlesRunner:
         widget.btn_install.set_visible(True)
         widget.btn_remove.set_visible(False)
 
+    '''
+    Get the names of the (non hidden) directories in a path, os.scandir
+    gives the entry type without a stat call for each entry
+    '''
+    def get_directories(self, path):
+        try:
+            with os.scandir(path) as entries:
+                return [entry.name for entry in entries
+                        if not entry.name.startswith(".") and entry.is_dir()]
+        except FileNotFoundError:
+            return []
+
     '''
     Check localy available runners
     '''
     def check_runners(self, install_latest=True):
-        runners = glob("%s/*/" % self.runners_path)
-        self.runners_available = []
-
-        for runner in runners:
-            self.runners_available.append(runner.split("/")[-2])
+        self.runners_available = self.get_directories(self.runners_path)
 
         if len(self.runners_available) > 0:
             logging.info("Runners found: \n%s" % ', '.join(
@@ -582,41 +934,45 @@ class BottlesRunner:
             '''
             Fetch runners from repository only if connected
             '''
-            if self.utils_conn.check_connection():
+            if self.cached_check_connection():
                 '''
                 Wine
                 '''
-                with urllib.request.urlopen(self.repository_api) as url:
-                    releases = json.loads(url.read().decode())
-                    tag = releases[0]["tag_name"]
-                    file = releases[0]["assets"][0]["name"]
+                releases = self.get_github_api(self.repository_api)
+                tag = releases[0]["tag_name"]
+                file = releases[0]["assets"][0]["name"]
 
-                    self.install_component("runner", tag, file)
+                self.install_component("runner", tag, file)
 
                 '''
                 Proton
-                with urllib.request.urlopen(self.proton_repository_api) as url:
-                    releases = json.loads(url.read().decode())
-                    tag = releases[0]["tag_name"]
-                    file = releases[0]["assets"][0]["name"]
+                releases = self.get_github_api(self.proton_repository_api)
+                tag = releases[0]["tag_name"]
+                file = releases[0]["assets"][0]["name"]
 
-                    self.install_component("runner:proton", tag, file)
+                self.install_component("runner:proton", tag, file)
                 '''
 
         '''
-        Sort runners_available and dxvk_available alphabetically
+        Sort runners_available alphabetically
         '''
         self.runners_available = sorted(self.runners_available, reverse=True)
-        self.dxvk_available = sorted(self.dxvk_available, reverse=True)
+
+        '''
+        Index the latest wine and proton runners for get_latest_runner
+        '''
+        self.latest_runners = {
+            "wine": next((runner for runner in self.runners_available
+                          if runner.lower().startswith("lutris")), None),
+            "proton": next((runner for runner in self.runners_available
+                            if runner.lower().startswith("proton")), None),
+        }
 
     '''
     Check localy available dxvk
     '''
     def check_dxvk(self, install_latest=True):
-        dxvk_list = glob("%s/*/" % self.dxvk_path)
-        self.dxvk_available = []
-
-        for dxvk in dxvk_list: self.dxvk_available.append(dxvk.split("/")[-2])
+        self.dxvk_available = self.get_directories(self.dxvk_path)
 
         if len(self.dxvk_available) > 0:
             logging.info("Dxvk found: \n%s" % ', '.join(self.dxvk_available))
@@ -627,21 +983,25 @@ class BottlesRunner:
             '''
             Fetch dxvk from repository only if connected
             '''
-            if self.utils_conn.check_connection():
-                with urllib.request.urlopen(self.dxvk_repository_api) as url:
-                    releases = json.loads(url.read().decode())
-                    tag = releases[0]["tag_name"]
-                    file = releases[0]["assets"][0]["name"]
+            if self.cached_check_connection():
+                releases = self.get_github_api(self.dxvk_repository_api)
+                tag = releases[0]["tag_name"]
+                file = releases[0]["assets"][0]["name"]
 
-                    self.install_component("dxvk", tag, file)
+                self.install_component("dxvk", tag, file)
+
+        '''
+        Sort dxvk_available alphabetically
+        '''
+        self.dxvk_available = sorted(self.dxvk_available, reverse=True)
 
     '''
     Get installed programs
     '''
     def get_programs(self, configuration):
-        bottle = "%s/%s" % (self.bottles_path, configuration.get("Name"))
-        results =  glob("%s/drive_c/users/*/Start Menu/Programs/**/*.lnk" % bottle, recursive=True)
-        results += glob("%s/drive_c/ProgramData/Microsoft/Windows/Start Menu/Programs/**/*.lnk" % bottle, recursive=True)
+        drive_c = f"{self.bottles_path}/{configuration.get('Name')}/drive_c"
+        results =  glob(f"{drive_c}/users/*/Start Menu/Programs/**/*.lnk", recursive=True)
+        results += glob(f"{drive_c}/ProgramData/Microsoft/Windows/Start Menu/Programs/**/*.lnk", recursive=True)
         installed_programs = []
 
         '''
@@ -652,9 +1012,10 @@ class BottlesRunner:
             if path not in ["Uninstall.lnk"]:
                 executable_path = ""
                 try:
-                    with open(program, "r", encoding='utf-8', errors='ignore') as lnk:
-                        lnk = lnk.read()
-                        executable_path = re.search('C:(.*).exe', lnk).group(0)
+                    with open(program, "rb") as lnk_file, \
+                         mmap.mmap(lnk_file.fileno(), 0, access=mmap.ACCESS_READ) as lnk:
+                        executable_path = self.lnk_executable_pattern.search(lnk).group(0)
+                        executable_path = executable_path.decode("utf-8", errors="ignore")
                         if executable_path.find("ninstall") < 0:
                             path = path.replace(".lnk", "")
                             installed_programs.append([path, executable_path])
@@ -668,55 +1029,104 @@ class BottlesRunner:
     Fetch online dependencies
     '''
     def fetch_dependencies(self):
-        if self.utils_conn.check_connection():
-            with urllib.request.urlopen(self.dependencies_repository_index) as url:
-                index = json.loads(url.read())
+        if self.cached_check_connection():
+            '''
+            Download the index only if it changed since the last fetch
+            '''
+            request = urllib.request.Request(self.dependencies_repository_index)
+            if self.dependencies_etag:
+                request.add_header("If-None-Match", self.dependencies_etag)
 
-                for dependency in index.items():
-                    self.supported_dependencies[dependency[0]] = dependency[1]
+            try:
+                with urllib.request.urlopen(request) as url:
+                    self.supported_dependencies = json_loads(url.read())
+                    self.dependencies_etag = url.headers.get("ETag")
+            except urllib.error.HTTPError as e:
+                if e.code != 304:
+                    raise
+                logging.info("Dependencies index not changed, skipping.")
 
     '''
     Fetch dependency manifest online
     '''
     def fetch_dependency_manifest(self, dependency_name, plain=False):
-        if self.utils_conn.check_connection():
+        if self.cached_check_connection():
             with urllib.request.urlopen("%s/%s.json" % (
                 self.dependencies_repository, dependency_name
             )) as url:
                 if plain:
                     return url.read().decode("utf-8")
                 else:
-                    return json.loads(url.read())
+                    return json_loads(url.read())
 
             return False
 
+    '''
+    Read the configuration of a bottle, parsing it only if it changed
+    since the last read
+    '''
+    def read_bottle_configuration(self, bottle_name_path):
+        configuration_file_path = "%s/%s/bottle.json" % (
+            self.bottles_path, bottle_name_path)
+        try:
+            mtime = os.stat(configuration_file_path).st_mtime_ns
+            cached_configuration = self.bottles_cache.get(bottle_name_path)
+
+            if cached_configuration and cached_configuration[0] == mtime:
+                configuration_file_json = cached_configuration[1]
+            else:
+                with open(configuration_file_path, "rb") as configuration_file:
+                    configuration_file_json = json_loads(configuration_file.read())
+                self.bottles_cache[bottle_name_path] = (mtime,
+                                                        configuration_file_json)
+        except:
+            configuration_file_json = self.sample_configuration
+            configuration_file_json["Broken"] = True
+            configuration_file_json["Name"] = bottle_name_path
+            configuration_file_json["Environment"] = "Undefined"
+
+        return bottle_name_path, configuration_file_json
+
     '''
     Check local bottles
     '''
     def check_bottles(self):
-        bottles = glob("%s/*/" % self.bottles_path)
+        bottles = self.get_directories(self.bottles_path)
 
         '''
         For each bottle add the path name to the `local_bottles` variable
-        and append the configuration
+        and append the configuration, the configurations are read
+        concurrently and collected in order
         '''
-        for bottle in bottles:
-            bottle_name_path = bottle.split("/")[-2]
-            try:
-                configuration_file = open('%s/bottle.json' % bottle)
-                configuration_file_json = json.load(configuration_file)
-                configuration_file.close()
-            except:
-                configuration_file_json = self.sample_configuration
-                configuration_file_json["Broken"] = True
-                configuration_file_json["Name"] = bottle_name_path
-                configuration_file_json["Environment"] = "Undefined"
-
-            self.local_bottles[bottle_name_path] = configuration_file_json
+        if bottles:
+            with ThreadPoolExecutor(max_workers=min(16, len(bottles))) as executor:
+                for bottle_name_path, configuration in executor.map(
+                        self.read_bottle_configuration, bottles):
+                    self.local_bottles[bottle_name_path] = configuration
 
         if len(self.local_bottles) > 0:
             logging.info("Bottles found: \n%s" % ', '.join(self.local_bottles))
 
+    '''
+    Write a json file atomically, the content is encoded once and
+    written with a single call to a temporary file which then
+    replaces the original, so a crash can't leave it truncated
+    '''
+    def write_json(self, path, data):
+        content = json_dumps(data)
+        temp_path = "%s.tmp" % path
+
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+        try:
+            view = memoryview(content)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        os.replace(temp_path, path)
+
     '''
     Update parameters in bottle configuration file
     '''
@@ -724,21 +1134,22 @@ class BottlesRunner:
         logging.info("Setting `%s` parameter to `%s` for `%s` Bottle…" % (
             key, value, configuration.get("Name")))
 
-        if configuration.get("Custom_Path"):
-            bottle_complete_path = configuration.get("Path")
-        else:
-            bottle_complete_path = "%s/%s" % (self.bottles_path,
-                                              configuration.get("Path"))
+        bottle_complete_path = self.get_bottle_path(configuration)
 
         if scope:
             configuration[scope][key] = value
         else:
             configuration[key] = value
 
-        with open("%s/bottle.json" % bottle_complete_path,
-                  "w") as configuration_file:
-            json.dump(configuration, configuration_file, indent=4)
-            configuration_file.close()
+        self.write_json("%s/bottle.json" % bottle_complete_path, configuration)
+
+        '''
+        Keep the cached configuration in sync with the file just written
+        '''
+        if not configuration.get("Custom_Path"):
+            self.bottles_cache[configuration.get("Path")] = (
+                os.stat("%s/bottle.json" % bottle_complete_path).st_mtime_ns,
+                configuration)
 
         self.window.page_list.update_bottles()
         return configuration
@@ -762,16 +1173,14 @@ class BottlesRunner:
         '''
         Define reusable variables
         '''
-        buffer_output = self.window.page_create.buffer_output
-        iter = buffer_output.get_end_iter()
+        append_output = self.window.page_create.append_output
 
         '''
         Check if there is at least one runner and dxvk installed, else
         install latest releases
         '''
         if 0 in [len(self.runners_available), len(self.dxvk_available)]:
-            buffer_output.insert(iter, "Runner and/or dxvk not found, installing latest version…\n")
-            iter = buffer_output.get_end_iter()
+            append_output("Runner and/or dxvk not found, installing latest version…\n")
             self.window.page_preferences.set_dummy_runner()
             self.window.show_runners_preferences_view()
             return self.async_checks()
@@ -795,39 +1204,40 @@ class BottlesRunner:
             bottle_complete_path = path
 
         '''
-        Run the progressbar update async
+        Start the progressbar pulse
         '''
-        a = RunAsync('pulse', self.window.page_create.pulse);a.start()
+        self.window.page_create.pulse()
 
-        buffer_output.insert(iter, "The wine configuration is being updated…\n")
-        iter = buffer_output.get_end_iter()
+        append_output("The wine configuration is being updated…\n")
 
         '''
         Prepare and execute the command
         '''
-        command = "WINEPREFIX={path} WINEARCH=win64 {runner} wineboot".format(
-            path = bottle_complete_path,
-            runner = "%s/%s/bin/wine64" % (self.runners_path, runner)
-        )
+        command = [f"{self.runners_path}/{runner}/bin/wine64", "wineboot"]
+        environment = dict(os.environ,
+                           WINEPREFIX=bottle_complete_path,
+                           WINEARCH="win64")
 
         '''
-        Get the command output and add to the buffer
+        Add the command output to the buffer line by line, while
+        the command is running
         '''
         process = subprocess.Popen(command,
-                                   shell=True,
+                                   env=environment,
                                    stdout=subprocess.PIPE,
-                                   stderr=subprocess.STDOUT)
-        process_output = process.stdout.read().decode("utf-8")
-
-        buffer_output.insert(iter, process_output)
-        iter = buffer_output.get_end_iter()
+                                   stderr=subprocess.STDOUT,
+                                   bufsize=1,
+                                   encoding="utf-8",
+                                   errors="replace")
+        for line in process.stdout:
+            append_output(line)
+        process.wait()
 
         '''
         Generate bottle configuration file
         '''
         logging.info("Generating Bottle configuration file…")
-        buffer_output.insert(iter, "\nGenerating Bottle configuration file…")
-        iter = buffer_output.get_end_iter()
+        append_output("\nGenerating Bottle configuration file…")
 
         configuration = self.sample_configuration
         configuration["Name"] = bottle_name
@@ -845,40 +1255,34 @@ class BottlesRunner:
         Apply environment configuration
         '''
         logging.info("Applying `%s` environment configuration.." % environment)
-        buffer_output.insert(iter, "\nApplying `%s` environment configuration.." % environment)
-        iter = buffer_output.get_end_iter()
+        append_output("\nApplying `%s` environment configuration.." % environment)
         if environment != "Custom":
-            environment_parameters = self.environments[environment.lower()]["Parameters"]
-            for parameter in configuration["Parameters"]:
-                if parameter in environment_parameters:
-                    configuration["Parameters"][parameter] = environment_parameters[parameter]
+            environment_parameters = self.environments_parameters[environment.lower()]
+            configuration["Parameters"].update({
+                parameter: environment_parameters[parameter]
+                for parameter in environment_parameters.keys() & configuration["Parameters"].keys()
+            })
 
         '''
         Save bottle configuration
         '''
-        with open("%s/bottle.json" % bottle_complete_path,
-                  "w") as configuration_file:
-            json.dump(configuration, configuration_file, indent=4)
-            configuration_file.close()
+        self.write_json("%s/bottle.json" % bottle_complete_path, configuration)
 
         '''
         Perform dxvk installation if configured
         '''
         if configuration["Parameters"]["dxvk"]:
             logging.info("Installing dxvk…")
-            buffer_output.insert(iter, "\nInstalling dxvk…")
-            iter = buffer_output.get_end_iter()
+            append_output("\nInstalling dxvk…")
             self.install_dxvk(configuration)
 
         '''
         Set the list button visible and set UI to usable again
         '''
         logging.info("Bottle `%s` successfully created!" % bottle_name)
-        buffer_output.insert_markup(
-            iter,
+        append_output(
             "\n<span foreground='green'>%s</span>" % "Your new bottle with name `%s` is now ready!" % bottle_name,
-            -1)
-        iter = buffer_output.get_end_iter()
+            markup=True)
 
         self.window.page_create.set_status("created")
         self.window.set_usable_ui(True)
@@ -891,39 +1295,56 @@ class BottlesRunner:
         self.check_bottles()
 
     def create_bottle(self, name, environment, path=False, runner=False):
-        a = RunAsync('create', self.async_create_bottle, [name,
-                                                          environment,
-                                                          path,
-                                                          runner])
-        a.start()
+        run_async('create', self.async_create_bottle, [name,
+                                                       environment,
+                                                       path,
+                                                       runner])
 
     '''
     Get latest installed runner
     '''
     def get_latest_runner(self, runner_type="wine"):
         if runner_type == "wine":
-            latest_runner = [idx for idx in self.runners_available if idx.lower().startswith("lutris")][0]
-        else:
-            latest_runner = [idx for idx in self.runners_available if idx.lower().startswith("proton")][0]
-        return latest_runner
+            return self.latest_runners["wine"]
+        return self.latest_runners["proton"]
 
     '''
     Get human size
     '''
     def get_human_size(self, size):
-        for unit in ['','Ki','Mi','Gi','Ti','Pi','Ei','Zi']:
-            if abs(size) < 1024.0:
-                return "%3.1f%s%s" % (size, unit, 'B')
-            size /= 1024.0
+        if size == 0:
+            return "0.0B"
 
-        return "%.1f%s%s" % (size, 'Yi', 'B')
+        '''
+        Each unit is 2^10 times the previous one, so the unit index
+        is the base 2 log of the size divided by 10
+        '''
+        unit = max(0, min(int(math.log2(abs(size)) / 10), len(self.size_units) - 1))
+
+        return "%3.1f%s%s" % (size / 1024 ** unit, self.size_units[unit], 'B')
 
     '''
     Get path size
     '''
     def get_path_size(self, path, human=True):
-        path = Path(path)
-        size = sum(f.stat().st_size for f in path.glob('**/*') if f.is_file())
+        '''
+        Walk the tree with os.scandir, the entry type comes from the
+        directory listing so only regular files need a stat call,
+        directory symlinks (e.g. dosdevices) are not followed
+        '''
+        size = 0
+        directories = deque([path])
+
+        while directories:
+            try:
+                with os.scandir(directories.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            size += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
 
         if human: return self.get_human_size(size)
 
@@ -932,11 +1353,17 @@ class BottlesRunner:
     '''
     Get disk size
     '''
-    def get_disk_size(self, human=True):
+    def get_disk_size(self, human=True, path=False):
         '''
-        TODO: disk should be taken from configuration Path
+        Use the disk of the bottles path unless a path is given
         '''
-        disk_total, disk_used, disk_free = shutil.disk_usage('/')
+        if not path:
+            path = self.bottles_path if os.path.isdir(self.bottles_path) else '/'
+
+        disk = os.statvfs(path)
+        disk_total = disk.f_blocks * disk.f_frsize
+        disk_used = (disk.f_blocks - disk.f_bfree) * disk.f_frsize
+        disk_free = disk.f_bavail * disk.f_frsize
 
         if human:
             disk_total = self.get_human_size(disk_total)
@@ -945,21 +1372,63 @@ class BottlesRunner:
 
         return {
             "total": disk_total,
-            "used": disk_free,
+            "used": disk_used,
             "free": disk_free,
         }
 
+    '''
+    Get the complete path of a bottle
+    '''
+    def get_bottle_path(self, configuration):
+        if configuration.get("Custom_Path"):
+            return configuration.get("Path")
+
+        return f"{self.bottles_path}/{configuration.get('Path')}"
+
+    '''
+    Get the bin path of the bottle runner, proton runner files are
+    located in the dist path
+    '''
+    def get_runner_bin(self, configuration):
+        runner = configuration.get("Runner")
+
+        if runner.startswith("Proton"):
+            runner = f"{runner}/dist"
+
+        return f"{self.runners_path}/{runner}/bin"
+
     '''
     Get bottle path size
     '''
     def get_bottle_size(self, configuration, human=True):
-        path = configuration.get("Path")
-        runner = configuration.get("Runner")
+        return self.get_path_size(self.get_bottle_path(configuration), human)
 
-        if not configuration.get("Custom_Path"):
-            path = "%s/%s" % (self.bottles_path, path)
+    '''
+    Remove a directory tree bottom-up, os.walk gets the entry types
+    from the directory listing so files are unlinked without a stat,
+    symlinks (e.g. dosdevices) are removed and never followed. Listing
+    errors are raised, os.walk would otherwise skip the directory and
+    the failure would surface later as a less useful rmdir error
+    '''
+    def remove_tree(self, path):
+        if os.path.islink(path):
+            return os.unlink(path)
+
+        def raise_error(error):
+            raise error
 
-        return self.get_path_size(path, human)
+        for root, dirs, files in os.walk(path, topdown=False, onerror=raise_error):
+            for name in files:
+                os.unlink(os.path.join(root, name))
+
+            for name in dirs:
+                dir_path = os.path.join(root, name)
+                if os.path.islink(dir_path):
+                    os.unlink(dir_path)
+                else:
+                    os.rmdir(dir_path)
+
+        os.rmdir(path)
 
     '''
     Delete a wineprefix
@@ -972,19 +1441,16 @@ class BottlesRunner:
         '''
         Delete path with all files
         '''
-        path = configuration.get("Path")
-
-        if path != "":
-            if not configuration.get("Custom_Path"):
-                path = "%s/%s" % (self.bottles_path, path)
+        if configuration.get("Path") != "":
+            path = self.get_bottle_path(configuration)
 
-            shutil.rmtree(path)
+            self.remove_tree(path)
             logging.info("Successfully deleted the bottle in path: %s" % path)
         else:
             logging.error("Empty path found, failing to avoid disasters.")
 
     def delete_bottle(self, configuration):
-        a = RunAsync('delete', self.async_delete_bottle, [configuration]);a.start()
+        run_async('delete', self.async_delete_bottle, [configuration])
 
     '''
     Repair a bottle generating a new configuration
@@ -992,8 +1458,7 @@ class BottlesRunner:
     def repair_bottle(self, configuration):
         logging.info("Trying to repair the `%s` bottle.." % configuration.get("Name"))
 
-        bottle_complete_path = "%s/%s" % (self.bottles_path,
-                                          configuration.get("Name"))
+        bottle_complete_path = f"{self.bottles_path}/{configuration.get('Name')}"
 
         '''
         Creating a new configuration, using path name as bottle name
@@ -1008,10 +1473,7 @@ class BottlesRunner:
         new_configuration["Update_Date"] = str(date.today())
         del new_configuration["Broken"]
 
-        with open("%s/bottle.json" % bottle_complete_path,
-                  "w") as configuration_file:
-            json.dump(new_configuration, configuration_file, indent=4)
-            configuration_file.close()
+        self.write_json("%s/bottle.json" % bottle_complete_path, new_configuration)
 
         '''
         Execute wineboot in bottle trying to generate missing files
@@ -1032,26 +1494,63 @@ class BottlesRunner:
     Methods for wine processes management
     '''
     def get_running_processes(self):
+        '''
+        Read the processes data straight from /proc, without forking
+        ps, grep and tr, only the wine processes have their stat read
+        '''
         processes = []
-        pids = subprocess.Popen(
-            "ps -eo pid,pmem,pcpu,stime,time,cmd | grep wine | tr -s ' ' '|'",
-            shell=True,
-            stdout=subprocess.PIPE).communicate()[0].decode("utf-8")
-
-        for pid in pids.split("\n"):
-            process_data = pid.split("|")
-            if len(process_data) >= 6 and "grep" not in process_data:
-                processes.append({
-                    "pid": process_data[1],
-                    "pmem": process_data[2],
-                    "pcpu": process_data[3],
-                    "stime": process_data[4],
-                    "time": process_data[5],
-                    "cmd": process_data[6]
-                })
+        clock_ticks = os.sysconf("SC_CLK_TCK")
+        memory_pages = os.sysconf("SC_PHYS_PAGES")
+        today = date.today()
+
+        with open("/proc/uptime") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        boot_time = time.time() - uptime
+
+        with os.scandir("/proc") as entries:
+            pids = [entry.name for entry in entries if entry.name.isdigit()]
+
+        for pid in pids:
+            try:
+                cmdline = self.read_proc_file(pid, "cmdline")
+                if b"wine" not in cmdline:
+                    continue
+                stat = self.read_proc_file(pid, "stat")
+            except OSError:
+                '''
+                The process exited in the meantime
+                '''
+                continue
+
+            '''
+            Fields after the command name, which can contain spaces,
+            the first one is the process state (field 3)
+            '''
+            fields = stat[stat.rfind(b")")+2:].split()
+            cpu_time = (int(fields[11]) + int(fields[12])) / clock_ticks
+            cpu_seconds = int(cpu_time)
+            start_time = int(fields[19]) / clock_ticks
+            elapsed_time = uptime - start_time
+            start_date = datetime.fromtimestamp(boot_time + start_time)
+
+            processes.append({
+                "pid": pid,
+                "pmem": "%.1f" % (int(fields[21]) * 100 / memory_pages),
+                "pcpu": "%.1f" % (cpu_time * 100 / elapsed_time if elapsed_time > 0 else 0),
+                "stime": start_date.strftime("%H:%M" if start_date.date() == today else "%b%d"),
+                "time": "%02d:%02d:%02d" % (cpu_seconds // 3600, cpu_seconds // 60 % 60, cpu_seconds % 60),
+                "cmd": cmdline.replace(b"\0", b" ").decode("utf-8", errors="replace").strip()
+            })
 
         return processes
 
+    def read_proc_file(self, pid, name):
+        fd = os.open("/proc/%s/%s" % (pid, name), os.O_RDONLY)
+        try:
+            return os.read(fd, 65536)
+        finally:
+            os.close(fd)
+
     '''
     Methods for add and remove values to register
     '''
@@ -1059,15 +1558,62 @@ class BottlesRunner:
         logging.info("Adding value `%s` with data `%s` for key `%s` in register for `%s` bottle." % (
             value, data, key, configuration.get("Name")))
 
-        self.run_command(configuration, "reg add '%s' /v %s /d %s /f" % (
-            key, value, data))
+        self.reg_batch(configuration, [(key, value, data)])
 
     def reg_delete(self, configuration, key, value):
         logging.info("Removing value `%s` for key `%s` in register for `%s` bottle." % (
             value, key, configuration.get("Name")))
 
-        self.run_command(configuration, "reg delete '%s' /v %s /f" % (
-            key, value))
+        self.reg_batch(configuration, [(key, value, None)])
+
+    '''
+    Apply many register changes with a single wine start, `ops` is a
+    list of (key, value, data) and a None data removes the value.
+    The changes are written to a .reg file in the temp directory of the
+    wineprefix, so regedit gets a C: path that does not depend on the Z:
+    drive mapping, and the file is removed once regedit exits
+    '''
+    def reg_batch(self, configuration, ops):
+        keys = {}
+        for key, value, data in ops:
+            keys.setdefault(key, []).append((value, data))
+
+        def escape(text):
+            return str(text).replace("\\", "\\\\").replace('"', '\\"')
+
+        lines = ["Windows Registry Editor Version 5.00", ""]
+        for key, values in keys.items():
+            lines.append("[%s]" % key)
+            for value, data in values:
+                if data is None:
+                    lines.append('"%s"=-' % escape(value))
+                else:
+                    lines.append('"%s"="%s"' % (escape(value), escape(data)))
+            lines.append("")
+
+        temp_path = "%s/drive_c/windows/temp" % self.get_bottle_path(configuration)
+        os.makedirs(temp_path, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w",
+                                         dir=temp_path,
+                                         prefix="bottles-",
+                                         suffix=".reg",
+                                         encoding="utf-16",
+                                         delete=False) as reg_file:
+            reg_file.write("\r\n".join(lines))
+
+        try:
+            process = self.run_command(
+                configuration,
+                "regedit /s 'C:\\windows\\temp\\%s'" % os.path.basename(reg_file.name))
+        except Exception:
+            os.remove(reg_file.name)
+            raise
+
+        def remove_reg_file():
+            process.wait()
+            os.remove(reg_file.name)
+
+        run_async('reg_batch', remove_reg_file)
 
     '''
     Methods for install and remove dxvk using official setup script
@@ -1079,13 +1625,12 @@ class BottlesRunner:
 
         option = "uninstall" if remove else "install"
 
-        command = 'WINEPREFIX="{path}" PATH="{runner}:$PATH" {dxvk_setup} {option}'.format (
-            path = "%s/%s" % (self.bottles_path, configuration.get("Path")),
-            runner = "%s/%s/bin" % (self.runners_path, configuration.get("Runner")),
-            dxvk_setup = "%s/%s/setup_dxvk.sh" % (self.dxvk_path, self.dxvk_available[0]),
-            option = option)
+        command = [f"{self.dxvk_path}/{self.dxvk_available[0]}/setup_dxvk.sh", option]
+        environment = dict(os.environ,
+                           WINEPREFIX=self.get_bottle_path(configuration),
+                           PATH=f"{self.get_runner_bin(configuration)}:{os.environ.get('PATH', '')}")
 
-        return subprocess.Popen(command, shell=True)
+        return subprocess.Popen(command, env=environment)
 
     def remove_dxvk(self, configuration):
         logging.info("Removing dxvk for `%s` bottle." % configuration.get("Name"))
@@ -1097,23 +1642,28 @@ class BottlesRunner:
     '''
     def dll_override(self, configuration, arch, dlls, source, revert=False):
         arch = "system32" if arch == 32 else "syswow64"
-        path = "%s/%s/drive_c/windows/%s" % (self.bottles_path,
-                                             configuration.get("Path"),
-                                             arch)
+        path = f"{self.get_bottle_path(configuration)}/drive_c/windows/{arch}"
 
         '''
         Revert dll from backup
         '''
-        if revert:
-            for dll in dlls:
-                shutil.move("%s/%s.back" % (path, dll), "%s/%s" % (path, dll))
-        else:
-            '''
-            Backup old dlls and install new one
-            '''
-            for dll in dlls:
-                shutil.move("%s/%s" % (path, dll), "%s/%s.old" % (path, dll))
-                shutil.copy("%s/%s" % (source, dll), "%s/%s" % (path, dll))
+        def revert_dll(dll):
+            shutil.move(f"{path}/{dll}.back", f"{path}/{dll}")
+
+        '''
+        Backup old dll and install new one, the file mode is not
+        needed so only the content is copied
+        '''
+        def override_dll(dll):
+            shutil.move(f"{path}/{dll}", f"{path}/{dll}.old")
+            shutil.copyfile(f"{source}/{dll}", f"{path}/{dll}")
+
+        '''
+        Each dll is independent, process them concurrently
+        '''
+        if dlls:
+            with ThreadPoolExecutor(max_workers=min(8, len(dlls))) as executor:
+                list(executor.map(revert_dll if revert else override_dll, dlls))
 
     '''
     Enable or disable virtual desktop for a bottle
@@ -1187,17 +1737,7 @@ class BottlesRunner:
         '''
         Prepare and execute the command
         '''
-        path = configuration.get("Path")
-        runner = configuration.get("Runner")
-
-        '''
-        If runner is proton then set path to /dist
-        '''
-        if runner.startswith("Proton"):
-            runner = "%s/dist" % runner
-
-        if not configuration.get("Custom_Path"):
-            path = "%s/%s" % (self.bottles_path, path)
+        path = self.get_bottle_path(configuration)
 
         '''
         Get environment variables from configuration to pass
@@ -1213,56 +1753,54 @@ class BottlesRunner:
         if parameters["environment_variables"]:
             environment_vars.append(parameters["environment_variables"])
 
+        environment_vars += [variable.format(path=path)
+                             for parameter, variables in self.parameters_environment
+                             if parameters[parameter]
+                             for variable in variables]
+
         if parameters["dxvk"]:
             dll_overrides.append("d3d11,dxgi=n")
-            environment_vars.append("DXVK_STATE_CACHE_PATH='%s'" % path)
-            environment_vars.append("STAGING_SHARED_MEMORY=1")
-            environment_vars.append("__GL_DXVK_OPTIMIZATIONS=1")
-            environment_vars.append("__GL_SHADER_DISK_CACHE=1")
-            environment_vars.append("__GL_SHADER_DISK_CACHE_PATH='%s'" % path)
 
         if parameters["dxvk_hud"]:
             environment_vars.append("DXVK_HUD='devinfo,memory,drawcalls,fps,version,api,compiler'")
         else:
             environment_vars.append("DXVK_HUD='compiler'")
 
-        if parameters["esync"]:
-            environment_vars.append("WINEESYNC=1 WINEDEBUG=+esync")
-
-        if parameters["fsync"]:
-            environment_vars.append("WINEFSYNC=1")
-
-        if parameters["aco_compiler"]:
-            environment_vars.append("RADV_PERFTEST=aco")
-
         if parameters["discrete_gpu"]:
-            if "nvidia" in subprocess.Popen(
-                "lspci | grep 'VGA'",
-                stdout=subprocess.PIPE,
-                shell=True).communicate()[0].decode("utf-8"):
-                environment_vars.append("__NV_PRIME_RENDER_OFFLOAD=1")
-                environment_vars.append("__GLX_VENDOR_LIBRARY_NAME='nvidia'")
-                environment_vars.append("__VK_LAYER_NV_optimus='NVIDIA_only'")
+            if self.has_nvidia_gpu():
+                environment_vars += self.nvidia_prime_environment
             else:
                 environment_vars.append("DRI_PRIME=1")
 
-        if parameters["pulseaudio_latency"]:
-            environment_vars.append("PULSE_LATENCY_MSEC=60")
-
         environment_vars.append("WINEDLLOVERRIDES='%s'" % ",".join(dll_overrides))
         environment_vars = " ".join(environment_vars)
 
-        command = "WINEPREFIX={path} WINEARCH=win64 {env} {runner} {command}".format(
-            path = path,
-            env = environment_vars,
-            runner = "%s/%s/bin/wine64" % (self.runners_path, runner),
-            command = command
-        )
+        runner = f"{self.get_runner_bin(configuration)}/wine64"
 
+        '''
+        The terminal runs the command through a shell
+        '''
         if terminal:
-            return UtilsTerminal(command)
+            return UtilsTerminal(self.wine_command_line(
+                path = shlex.quote(path),
+                env = environment_vars,
+                runner = shlex.quote(runner),
+                command = command
+            ))
+
+        '''
+        Otherwise run wine directly, the environment variables (which
+        use the shell syntax) are parsed into the process environment
+        '''
+        environment = dict(os.environ, WINEPREFIX=path, WINEARCH="win64")
+        for variable in shlex.split(environment_vars):
+            name, separator, value = variable.partition("=")
+            if not separator:
+                logging.warning("Ignoring environment variable `%s`, expected NAME=value." % variable)
+                continue
+            environment[name] = os.path.expandvars(value)
 
-        return subprocess.Popen(command, shell=True)
+        return subprocess.Popen([runner] + shlex.split(command), env=environment)
 
     '''
     Method for sending status to wineprefixes
@@ -1301,18 +1839,16 @@ class BottlesRunner:
         logging.info("Opening the file manager on the path…")
 
         if path_type == "bottle":
-            path = "%s/%s/drive_c" % (self.bottles_path,
-                                      configuration.get("Path"))
+            path = f"{self.get_bottle_path(configuration)}/drive_c"
 
         if path_type == "runner":
-            path = "%s/%s" % (self.runners_path, runner)
+            path = f"{self.runners_path}/{runner}"
 
         if path_type == "dxvk":
-            path = "%s/%s" % (self.dxvk_path, dxvk)
+            path = f"{self.dxvk_path}/{dxvk}"
 
         '''
         Prepare and execute the command
         '''
-        command = "xdg-open %s" % path
-        return subprocess.Popen(command, shell=True)
+        return subprocess.Popen(["xdg-open", path])
 
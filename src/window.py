@@ -25,7 +25,7 @@ import webbrowser, time
 
 from .params import *
 from .download import BottlesDownloadEntry
-from .runner import BottlesRunner, RunAsync
+from .runner import BottlesRunner
 
 from .pages.add import BottlesAdd, BottlesAddDetails
 from .pages.create import BottlesCreate